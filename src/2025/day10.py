@@ -1,6 +1,17 @@
 #!/usr/bin/env python
 import heapq
 import math
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Any, cast
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only required for the sweep.
+    np = cast(Any, None)
+
+MOVES_4: list[tuple[int, int]] = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # RIGHT, DOWN, LEFT, UP
+MOVES_8: list[tuple[int, int]] = [*MOVES_4, (1, 1), (1, -1), (-1, 1), (-1, -1)]  # ..., and the diagonals
 
 
 def find_shortest_path(
@@ -39,6 +50,145 @@ def find_shortest_path(
     return int(shortest_path)
 
 
+def find_all_shortest_paths(grid: dict[tuple[int, int], int], start: tuple[int, int], size: int) -> list[list[int]]:
+    """In the grid, find the shortest path from `start` to every position, in a single pass.
+
+    Only RIGHT and DOWN moves are allowed, so the grid is a DAG and each position only depends on the one above it and
+    the one to its left. Positions that cannot be reached from `start` are set to -1.
+    """
+    sx, sy = start
+    table: list[list[int]] = [[-1] * size for _ in range(size)]
+
+    for x in range(sx, size):
+        above: list[int] = table[x - 1]
+        row: list[int] = table[x]
+
+        for y in range(sy, size):
+            best: int
+            if x == sx and y == sy:
+                best = 0
+            elif x == sx:
+                best = row[y - 1]
+            elif y == sy:
+                best = above[y]
+            else:
+                best = min(above[y], row[y - 1])
+
+            row[y] = best + grid[(x, y)]
+
+    return table
+
+
+def find_shortest_paths_buckets(
+    rows: list[list[int]],
+    start: tuple[int, int],
+    moves: list[tuple[int, int]] = MOVES_4,
+    target: tuple[int, int] | None = None,
+) -> array[int]:
+    """In the grid, find the shortest path from `start` to every position, using the given moves.
+
+    Dial's algorithm: the danger of the cells is a small non-negative integer, so the priority queue is a circular
+    array of `max_danger + 1` buckets, indexed by path danger. Distances are kept in a dense row-major array, and a
+    position is only queued again when its distance decreases. Stops early once `target` is settled.
+
+    Returns the row-major distances, with -1 for positions that were not reached.
+    """
+    height: int = len(rows)
+    width: int = len(rows[0])
+    weights: array[int] = array("q", [v for row in rows for v in row])
+    dist: array[int] = array("q", [-1]) * len(weights)
+
+    n_buckets: int = max(weights) + 1
+    buckets: list[list[int]] = [[] for _ in range(n_buckets)]
+    target_index: int = -1 if target is None else target[0] * width + target[1]
+
+    start_index: int = start[0] * width + start[1]
+    current: int = weights[start_index]
+    dist[start_index] = current
+    buckets[current % n_buckets].append(start_index)
+    queued: int = 1
+
+    while queued:
+        bucket: list[int] = buckets[current % n_buckets]
+
+        while bucket:
+            i: int = bucket.pop()
+            queued -= 1
+
+            # Stale entry, the position was settled with a lower danger
+            if dist[i] != current:
+                continue
+
+            if i == target_index:
+                return dist
+
+            x, y = divmod(i, width)
+            for dx, dy in moves:
+                nx, ny = x + dx, y + dy
+
+                # Within grid bounds
+                if 0 <= nx < height and 0 <= ny < width:
+                    j: int = nx * width + ny
+                    new_danger: int = current + weights[j]
+
+                    if dist[j] == -1 or new_danger < dist[j]:
+                        dist[j] = new_danger
+                        buckets[new_danger % n_buckets].append(j)
+                        queued += 1
+
+        current += 1
+
+    return dist
+
+
+def read_rows(file: str) -> Iterable[Any]:
+    """Read the grid rows lazily. A `.npy` file is memory-mapped, so the full grid never has to be resident."""
+    if file.endswith(".npy"):
+        return np.load(file, mmap_mode="r")
+
+    return (np.array(line.split(), dtype=np.int64) for line in open(file))
+
+
+def sweep_shortest_paths(rows: Iterable[Any], start: tuple[int, int]) -> Iterator[Any]:
+    """Yield, row by row, the shortest path from `start` to every position in that row. Requires NumPy.
+
+    With only RIGHT and DOWN moves, `row[y] = w[y] + min(above[y], row[y - 1])`. Unrolling the recurrence with the
+    prefix sums `P` of the row gives `row = P + prefix_min(above - (P - w))`, so each row is a handful of vector
+    operations and only the previous row is kept. Positions that cannot be reached from `start` are set to -1.
+    """
+    sx, sy = start
+    above: Any = None
+
+    for x, row in enumerate(rows):
+        weights: Any = np.asarray(row, dtype=np.int64)[sy:]
+        res: Any = np.full(len(weights) + sy, -1, dtype=np.int64)
+
+        if x >= sx:
+            prefix: Any = np.cumsum(weights)
+            above = prefix if above is None else prefix + np.minimum.accumulate(above - (prefix - weights))
+            res[sy:] = above
+
+        yield res
+
+
+def find_shortest_paths_sweep(
+    rows: Iterable[Any], start: tuple[int, int], targets: list[tuple[int, int]]
+) -> dict[tuple[int, int], int]:
+    """Find the shortest path from `start` to each of the `targets`, streaming the rows. Requires NumPy."""
+    res: dict[tuple[int, int], int] = {}
+    last_row: int = max(x for x, _ in targets)
+
+    for x, costs in enumerate(sweep_shortest_paths(rows=rows, start=start)):
+        for tx, ty in targets:
+            if tx == x:
+                res[(tx, ty)] = int(costs[ty])
+
+        if x == last_row:
+            break
+
+    return res
+
+
 def solve() -> None:
     """Solve the problems."""
     use_example: bool = False
@@ -53,11 +203,14 @@ def solve() -> None:
     # Part 01
     p1: int = min(sum(v) for v in [*rows, *cols])
 
+    # Part 02, 03 share the same start, so compute every shortest path at once.
+    shortest_paths: list[list[int]] = find_all_shortest_paths(grid=grid, start=(0, 0), size=size)
+
     # Part 02
-    p2: int = find_shortest_path(grid=grid, start=(0, 0), target=(14, 14))
+    p2: int = shortest_paths[14][14]
 
     # Part 03
-    p3: int = find_shortest_path(grid=grid, start=(0, 0), target=(size - 1, size - 1), size=size)
+    p3: int = shortest_paths[size - 1][size - 1]
 
     print(f"Part 01: {p1}")
     print(f"Part 02: {int(p2)}")
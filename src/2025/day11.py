@@ -1,79 +1,202 @@
 #!/usr/bin/env python
-import re
+import math
+import sys
+from collections.abc import Callable, Iterable, Sequence
 
+ALPHABET: str = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!@#$%^"
+ALPHABET_BYTES: bytes = ALPHABET.encode()
+BUILTIN_FORMATS: dict[int, str] = {2: "b", 8: "o", 10: "d", 16: "X"}  # `format` specs matching the alphabet
+CHUNK_DIGITS: int = 32  # Numerals up to this many digits are converted directly.
 
-def get_value(c: str) -> int:
-    """Get the integer value of the given character."""
-    if c.isdigit():
-        return int(c)
+# Lookup tables: the value of each byte (INVALID_DIGIT if not in the alphabet), and the character of each value.
+INVALID_DIGIT: int = 255
+DECODE_TABLE: bytes = bytes(ALPHABET.find(chr(c)) if chr(c) in ALPHABET else INVALID_DIGIT for c in range(256))
+ENCODE_TABLE: tuple[str, ...] = tuple(ALPHABET)
 
-    if c.isupper():
-        return ord(c) - 55
 
-    if c.islower():
-        return ord(c) - 61
+def can_use_builtin(lngth: int, base: int) -> bool:
+    """Check that the builtin conversions accept a numeral of this length, given the int/str conversion limit."""
+    limit: int = sys.get_int_max_str_digits()
+    return base & (base - 1) == 0 or limit == 0 or lngth <= limit
 
-    return 62 + "!@#$%^".index(c)
 
+def horner(digits: Sequence[int], base: int) -> int:
+    """Evaluate the digits, most significant first, with Horner's rule."""
+    tlt: int = 0
+    for d in digits:
+        tlt = tlt * base + d
 
-def encode_value(value: int) -> str:
-    """Get the character for the given value."""
-    if 0 <= value <= 9:
-        return str(value)
+    return tlt
 
-    if 10 <= value <= 35:
-        return chr(value + 55)
 
-    if 36 <= value <= 61:
-        return chr(value + 61)
+def get_value(c: str) -> int:
+    """Get the integer value of the given character."""
+    value: int = DECODE_TABLE[ord(c)] if ord(c) < 256 else INVALID_DIGIT
+    if value == INVALID_DIGIT:
+        raise ValueError(f"Invalid digit: {c!r}.")
 
-    if 62 <= value <= 67:
-        return "!@#$%^"[value - 62]
+    return value
 
-    return chr(value)
+
+def encode_value(value: int) -> str:
+    """Get the character for the given value."""
+    return ENCODE_TABLE[value] if 0 <= value < len(ENCODE_TABLE) else chr(value)
 
 
 def convert_to_base_10(value: str, from_base: int) -> int:
     """Convert the given value from the given base into the base 10."""
-    tlt: int = 0
-    for i, c in enumerate(value[::-1]):
-        tlt += (from_base**i) * get_value(c=c)
+    return decode_numeral(numeral=value.encode(), from_base=from_base)
+
+
+def decode_numeral(numeral: bytes, from_base: int) -> int:
+    """Convert the given numeral, as raw bytes, from the given base into the base 10.
+
+    Uses the builtin `int` when the alphabet matches it, Horner's rule for short numerals, and otherwise combines
+    chunks of digits pairwise in a balanced tree, so the big multiplications stay subquadratic.
+    """
+    if (
+        numeral
+        and from_base <= 36
+        and not numeral.strip(ALPHABET_BYTES[:from_base])
+        and can_use_builtin(lngth=len(numeral), base=from_base)
+    ):
+        return int(numeral, from_base)
+
+    # All the digit values at once
+    digits: bytes = numeral.translate(DECODE_TABLE)
+    if INVALID_DIGIT in digits:
+        raise ValueError(f"Invalid digit in: {numeral!r}.")
+
+    if len(digits) <= CHUNK_DIGITS:
+        return horner(digits=digits, base=from_base)
+
+    # Chunks of CHUNK_DIGITS digits, most significant first. The first chunk takes the remainder.
+    first: int = len(digits) % CHUNK_DIGITS or CHUNK_DIGITS
+    chunks: list[int] = [horner(digits=digits[:first], base=from_base)] + [
+        horner(digits=digits[i : i + CHUNK_DIGITS], base=from_base) for i in range(first, len(digits), CHUNK_DIGITS)
+    ]
 
-    return tlt
+    # Combine pairs from the least significant end, squaring the multiplier at each level.
+    multiplier: int = from_base**CHUNK_DIGITS
+    while len(chunks) > 1:
+        odd: list[int] = chunks[:1] if len(chunks) % 2 else []
+        chunks = odd + [chunks[i] * multiplier + chunks[i + 1] for i in range(len(chunks) % 2, len(chunks), 2)]
+        multiplier *= multiplier
+
+    return chunks[0]
+
+
+def decode_lines(data: bytes) -> list[int]:
+    """Convert every `numeral base` line of the raw input into the base 10, in a single pass over the bytes."""
+    res: list[int] = []
+
+    for line in data.splitlines():
+        if line.strip():
+            numeral, base = line.strip().rsplit(b" ", 1)
+            res.append(decode_numeral(numeral=numeral, from_base=int(base)))
+
+    return res
 
 
 def convert_to_base(value: int, base: int) -> str:
-    """Convert the given base-10 number to the given base."""
-    res: str = ""
+    """Convert the given base-10 number to the given base.
 
-    while value > 0:
-        res += encode_value(value=value % base)
-        value //= base
+    The number of digits is worked out first, and the digits are written into a preallocated buffer by recursively
+    splitting the value in halves with `divmod`, down to chunks of CHUNK_DIGITS digits.
+    """
+    if value <= 0:
+        return ""
 
-    return res[::-1]
+    # The bit length bounds the number of digits from above
+    if base in BUILTIN_FORMATS and can_use_builtin(lngth=value.bit_length(), base=base):
+        return format(value, BUILTIN_FORMATS[base])
 
+    # Number of digits: estimate from the bit length, then correct it
+    lngth: int = max(1, int(value.bit_length() * math.log(2) / math.log(base)))
+    while base**lngth <= value:
+        lngth += 1
 
-def get_smallest_base_having_given_length(value: int, length: int) -> int:
-    """Get the smallest base that will have the converted `value` of the given `length`."""
-    current_base: int = 11  # since we know that the given value, in the problem, does not have base-10 as the smallest.
+    while lngth > 1 and base ** (lngth - 1) > value:
+        lngth -= 1
+
+    buffer: list[str] = [""] * lngth
+    powers: dict[int, int] = {}
+    encode: Callable[[int], str] = ENCODE_TABLE.__getitem__ if base <= len(ENCODE_TABLE) else encode_value
+
+    def fill(value: int, start: int, width: int) -> None:
+        """Write the `width` digits of the value into the buffer, starting at `start`."""
+        if width <= CHUNK_DIGITS:
+            for i in range(start + width - 1, start - 1, -1):
+                value, digit = divmod(value, base)
+                buffer[i] = encode(digit)
+            return
+
+        low_width: int = width // 2
+        if low_width not in powers:
+            powers[low_width] = base**low_width
+
+        high, low = divmod(value, powers[low_width])
+        fill(value=high, start=start, width=width - low_width)
+        fill(value=low, start=start + width - low_width, width=low_width)
+
+    fill(value=value, start=0, width=lngth)
+    return "".join(buffer)
+
+
+def integer_root(value: int, k: int) -> int:
+    """Get the floor of the k-th root of the value, with Newton's method on integers."""
+    if value < 2:
+        return value
+
+    # Initial guess above the root, from the bit length
+    x: int = 1 << -(-value.bit_length() // k)
     while True:
-        res: str = convert_to_base(value=value, base=current_base)
+        y: int = ((k - 1) * x + value // x ** (k - 1)) // k
+        if y >= x:
+            return x
+
+        x = y
+
 
-        if len(res) <= length:
-            return current_base
+def get_smallest_base_having_given_length(value: int, length: int, min_base: int = 11) -> int:
+    """Get the smallest base that will have the converted `value` of the given `length`.
 
-        current_base += 1
+    The value has at most `length` digits exactly when `base**length > value`, so the smallest such base is one more
+    than the integer `length`-th root of the value. `min_base` defaults to 11, since we know that the given value, in
+    the problem, does not have base-10 as the smallest.
+    """
+    if value <= 0:
+        return min_base
+
+    if length < 1:
+        raise Exception("Length must be positive.")
+
+    base: int = max(min_base, integer_root(value=value, k=length) + 1)
+
+    # Guard against any off-by-one in the root
+    while base > min_base and (base - 1) ** length > value:
+        base -= 1
+
+    while base**length <= value:
+        base += 1
+
+    return base
+
+
+def get_smallest_bases_having_given_lengths(queries: Iterable[tuple[int, int]], min_base: int = 11) -> list[int]:
+    """Batched `get_smallest_base_having_given_length` over (value, length) queries."""
+    return [
+        get_smallest_base_having_given_length(value=value, length=length, min_base=min_base)
+        for value, length in queries
+    ]
 
 
 def solve() -> None:
     """Solve the problems."""
     use_example: bool = False
-    lines: list[tuple[str, int]] = [
-        (n, int(b)) for n, b in re.findall(r"(.+) (\d+)", open("day11.em" if use_example else "day11.in").read())
-    ]
 
     # Part 01
-    decimal_values: list[int] = [convert_to_base_10(value=number, from_base=base) for number, base in lines]
+    decimal_values: list[int] = decode_lines(data=open("day11.em" if use_example else "day11.in", "rb").read())
     p1: int = max(decimal_values)
 
     # Part 02
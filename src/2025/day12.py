@@ -1,183 +1,472 @@
 #!/usr/bin/env python
+from __future__ import annotations
+
+from array import array
 from collections import deque
-from copy import deepcopy
+from collections.abc import Callable, Iterable
+from typing import Any, cast
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only required for the ndarray backend.
+    np = cast(Any, None)
 
-def display_grid(grid: dict[tuple[int, int], int], size: int) -> None:
-    """Display the grid."""
-    for x in range(size):
-        for y in range(size):
-            print(grid[(x, y)], end="\t")
-        print()
+MODULO: int = 1073741824
 
 
-def do_all(grid: dict[tuple[int, int], int], amount: int, type_: str) -> None:
-    """Do the `ALL` instruction on the grid."""
-    for k in grid.keys():
-        if type_ == "ADD":
-            grid[k] += amount
+def get_line(size: int, is_row: bool, row_col: int) -> slice:
+    """Get the slice of a row-major grid for the given ROW/COL (0-indexed)."""
+    if is_row:
+        return slice(row_col * size, (row_col + 1) * size)
 
-        elif type_ == "SUB":
-            grid[k] -= amount
+    return slice(row_col, None, size)
 
-        elif type_ == "MULTIPLY":
-            grid[k] *= amount
 
-        else:
-            assert "Invalid INSTRUCTION type."
+def rotate(values: array[int], shift: int) -> array[int]:
+    """Rotate the values to the right by the given shift."""
+    shift %= len(values)
+    return values[len(values) - shift :] + values[: len(values) - shift]
 
-        # Overflow
-        grid[k] = grid[k] % 1073741824
 
+class Grid:
+    """Dense square grid, stored row-major in a flat `array('q')`. All values are kept modulo 2^30.
 
-def do_shift(grid: dict[tuple[int, int], int], size: int, type_: str, row_col_number: int, shift_amount: int) -> None:
-    """Perform the `SHIFT` instruction on the grid."""
-    if type_ == "ROW":
-        row_values: list[int] = [grid[row_col_number - 1, i] for i in range(size)]
-        shifted_row_values: deque[int] = deque(row_values)
-        shifted_row_values.rotate(shift_amount)
+    The ROW and COL sums are maintained incrementally in a max segment tree (ROWs first, then COLs), so the highest
+    sum can be read in O(1) after any instruction.
 
-        # Adding back into grid
-        for i, v in enumerate(shifted_row_values):
-            grid[(row_col_number - 1, i)] = v
+    With `use_numpy`, the cells are stored as an ndarray instead: instructions are vectorised, SHIFTs use `np.roll`
+    and the sums are rebuilt with axis reductions.
+    """
 
-    elif type_ == "COL":
-        col_values: list[int] = [grid[i, row_col_number - 1] for i in range(size)]
-        shifted_col_values: deque[int] = deque(col_values)
-        shifted_col_values.rotate(shift_amount)
+    def __init__(self, size: int, values: Iterable[int], use_numpy: bool = False) -> None:
+        if use_numpy and np is None:
+            raise Exception("NumPy is required for the ndarray backend.")
 
-        # Adding back into grid
-        for i, v in enumerate(shifted_col_values):
-            grid[(i, row_col_number - 1)] = v
+        self.size: int = size
+        self.__use_numpy: bool = use_numpy
+        self.__cells: Any = np.fromiter(values, dtype=np.int64) if use_numpy else array("q", values)
+        self.__sums: array[int] = array("q")
+        self.__build_sums()
 
-    else:
-        assert "Invalid SHIFT type."
+    def copy(self) -> Grid:
+        """Get a copy of the grid."""
+        return Grid(size=self.size, values=self.__cells, use_numpy=self.__use_numpy)
 
+    def get_value(self, x: int, y: int) -> int:
+        """Get the value at the given position."""
+        return int(self.__cells[x * self.size + y])
 
-def do_row_col_action(
-    grid: dict[tuple[int, int], int], amount: int, type_: str, size: int, is_row: bool, row_col: int
-) -> None:
-    """Do the instruction on the given ROW/COL."""
-    for i in range(size):
-        position: tuple[int, int] = (int(row_col) - 1, i) if is_row else (i, int(row_col) - 1)
+    def display(self) -> None:
+        """Display the grid."""
+        for x in range(self.size):
+            print("\t".join(map(str, self.__cells[x * self.size : (x + 1) * self.size])))
+
+    def __build_sums(self) -> None:
+        """Rebuild the segment tree of ROW/COL sums from the cells."""
+        if self.__use_numpy:
+            cells: Any = self.__cells.reshape(self.size, self.size)
+            sums: list[int] = cells.sum(axis=1).tolist() + cells.sum(axis=0).tolist()
+        else:
+            sums = [
+                sum(self.__cells[get_line(size=self.size, is_row=is_row, row_col=i)])
+                for is_row in (True, False)
+                for i in range(self.size)
+            ]
+
+        self.__sums = array("q", [0]) * len(sums) + array("q", sums)
+        self.__rebuild_maxima()
+
+    def __rebuild_maxima(self) -> None:
+        """Recompute every internal node of the segment tree from the sums, bottom-up in O(size)."""
+        tree: array[int] = self.__sums
+        for i in range(2 * self.size - 1, 0, -1):
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+
+    def __set_sum(self, index: int, value: int) -> None:
+        """Set the sum at the given index (ROWs first, then COLs), updating the maximum above it."""
+        tree: array[int] = self.__sums
+        i: int = index + 2 * self.size
+        tree[i] = value
+
+        i //= 2
+        while i:
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+            i //= 2
+
+    def __update_sums(self, is_row: bool, row_col: int, old: Any, new: Any) -> None:
+        """Update the sums after the given ROW/COL (0-indexed) changed from the `old` to the `new` values."""
+        line_offset: int = 0 if is_row else self.size
+        cross_offset: int = self.size if is_row else 0
+
+        if self.__use_numpy:
+            total: int = int(new.sum())
+            diffs: list[int] = (new - old).tolist()
+        else:
+            total = sum(new)
+            diffs = [v - o for o, v in zip(old, new)]
+
+        # Every crossing line changes by the difference of the shared cell. Their leaves are written directly, and
+        # the maxima rebuilt once, instead of walking to the root from each of them.
+        tree: array[int] = self.__sums
+        leaf: int = 2 * self.size + cross_offset
+        changed: bool = False
+        for i, diff in enumerate(diffs):
+            if diff:
+                tree[leaf + i] += diff
+                changed = True
+
+        if changed:
+            self.__rebuild_maxima()
+
+        self.__set_sum(index=line_offset + row_col, value=total)
+
+    @staticmethod
+    def apply(values: array[int], amount: int, type_: str) -> array[int]:
+        """Apply the ADD/SUB/MULTIPLY instruction to the given values."""
+        if type_ == "ADD":
+            return array("q", ((v + amount) % MODULO for v in values))
+
+        if type_ == "SUB":
+            return array("q", ((v - amount) % MODULO for v in values))
+
+        if type_ == "MULTIPLY":
+            return array("q", ((v * amount) % MODULO for v in values))
+
+        raise Exception("Invalid INSTRUCTION type.")
+
+    def __apply(self, values: Any, amount: int, type_: str) -> Any:
+        """Apply the ADD/SUB/MULTIPLY instruction to the given values, on the grid's backend."""
+        if not self.__use_numpy:
+            return self.apply(values=values, amount=amount, type_=type_)
+
+        # Reduce first, so the products stay within int64.
+        amount %= MODULO
 
         if type_ == "ADD":
-            grid[position] += int(amount)
+            return (values + amount) % MODULO
+
+        if type_ == "SUB":
+            return (values - amount) % MODULO
+
+        if type_ == "MULTIPLY":
+            return (values * amount) % MODULO
+
+        raise Exception("Invalid INSTRUCTION type.")
+
+    def do_all(self, amount: int, type_: str) -> None:
+        """Do the `ALL` instruction on the grid."""
+        self.__cells = self.__apply(values=self.__cells, amount=amount, type_=type_)
+        self.__build_sums()
+
+    def do_row_col_action(self, amount: int, type_: str, is_row: bool, row_col: int) -> None:
+        """Do the instruction on the given ROW/COL."""
+        line: slice = get_line(size=self.size, is_row=is_row, row_col=row_col - 1)
+        old: Any = self.__cells[line]
+        new: Any = self.__apply(values=old, amount=amount, type_=type_)
+
+        # The sums are updated first, as an ndarray slice is a view on the cells.
+        self.__update_sums(is_row=is_row, row_col=row_col - 1, old=old, new=new)
+        self.__cells[line] = new
 
-        elif type_ == "SUB":
-            grid[position] -= int(amount)
+    def do_shift(self, type_: str, row_col_number: int, shift_amount: int) -> None:
+        """Perform the `SHIFT` instruction on the grid, rotating the ROW/COL to the right/down."""
+        if type_ not in ("ROW", "COL"):
+            raise Exception("Invalid SHIFT type.")
 
-        elif type_ == "MULTIPLY":
-            grid[position] *= int(amount)
+        line: slice = get_line(size=self.size, is_row=type_ == "ROW", row_col=row_col_number - 1)
+        old: Any = self.__cells[line]
+        new: Any = np.roll(old, shift_amount) if self.__use_numpy else rotate(values=old, shift=shift_amount)
 
+        self.__update_sums(is_row=type_ == "ROW", row_col=row_col_number - 1, old=old, new=new)
+        self.__cells[line] = new
+
+    def apply_transform(self, transform: Transform) -> None:
+        """Apply the composed transform to every cell of the grid."""
+        cells: Any = self.__cells
+
+        if self.__use_numpy:
+            # Zero-copy views on the `array('q')` buffers.
+            mul: Any = np.frombuffer(transform.mul, dtype=np.int64)
+            add: Any = np.frombuffer(transform.add, dtype=np.int64)
+            src: Any = np.frombuffer(transform.src, dtype=np.int64)
+            self.__cells = (mul * cells[src] + add) % MODULO
         else:
-            assert "Invalid INSTRUCTION type."
+            self.__cells = array(
+                "q", ((m * cells[src] + a) % MODULO for m, a, src in zip(transform.mul, transform.add, transform.src))
+            )
+
+        self.__build_sums()
+
+    def get_highest_row_col_sum(self) -> int:
+        """Get the highest sum of the ROWS/COLS."""
+        return self.__sums[1]
+
+
+class Transform:
+    """Composed effect of a sequence of instructions on a grid.
 
-        # Overflow
-        grid[position] = grid[position] % 1073741824
+    Every cell is an affine map (mod 2^30) of a source cell: `new[i] = mul[i] * old[src[i]] + add[i]`. The permutation
+    `src` captures the SHIFTs.
+    """
 
+    def __init__(self, size: int, mul: array[int], add: array[int], src: array[int]) -> None:
+        self.size: int = size
+        self.mul: array[int] = mul
+        self.add: array[int] = add
+        self.src: array[int] = src
 
-def do_instruction(instruction: list[str], grid: dict[tuple[int, int], int], size: int) -> None:
-    """Perform the given instruction on the ROW/COL in the grid."""
-    # Instruction action on
-    if "ALL" in instruction:
-        # Perform on all values in the grid
-        instr: str = instruction[0]
-        amount: int = int(instruction[1])
+    @classmethod
+    def identity(cls, size: int) -> Transform:
+        """Get the transform that leaves the grid unchanged."""
+        return cls(
+            size=size,
+            mul=array("q", [1]) * (size * size),
+            add=array("q", [0]) * (size * size),
+            src=array("q", range(size * size)),
+        )
 
-        do_all(grid=grid, amount=amount, type_=instr)
+    @classmethod
+    def from_instructions(cls, size: int, instructions: Iterable[Instruction]) -> Transform:
+        """Compose the transform of executing the given instructions in order."""
+        transform: Transform = cls.identity(size=size)
 
-    elif "SHIFT" in instruction:
-        # Performing a SHIFT
-        type_: str = instruction[1]
-        number: int = int(instruction[2])
-        amount: int = int(instruction[-1])
+        for op, target, number, amount in instructions:
+            line: slice = (
+                slice(None) if target == "ALL" else get_line(size=size, is_row=target == "ROW", row_col=number - 1)
+            )
 
-        do_shift(grid=grid, size=size, type_=type_, row_col_number=number, shift_amount=amount)
+            if op == "SHIFT":
+                transform.mul[line] = rotate(values=transform.mul[line], shift=amount)
+                transform.add[line] = rotate(values=transform.add[line], shift=amount)
+                transform.src[line] = rotate(values=transform.src[line], shift=amount)
 
+            elif op == "MULTIPLY":
+                transform.mul[line] = Grid.apply(values=transform.mul[line], amount=amount, type_=op)
+                transform.add[line] = Grid.apply(values=transform.add[line], amount=amount, type_=op)
+
+            else:
+                transform.add[line] = Grid.apply(values=transform.add[line], amount=amount, type_=op)
+
+        return transform
+
+    def then(self, other: Transform) -> Transform:
+        """Compose the transform that applies this transform, followed by the `other`."""
+        mul: list[int] = []
+        add: list[int] = []
+
+        for m, a, j in zip(other.mul, other.add, other.src):
+            mul.append(m * self.mul[j] % MODULO)
+            add.append((m * self.add[j] + a) % MODULO)
+
+        return Transform(
+            size=self.size, mul=array("q", mul), add=array("q", add), src=array("q", [self.src[j] for j in other.src])
+        )
+
+    def power(self, k: int) -> Transform:
+        """Compose the transform with itself `k` times, by repeated squaring."""
+        result: Transform = Transform.identity(size=self.size)
+        base: Transform = self
+
+        while k:
+            if k & 1:
+                result = result.then(base)
+
+            base = base.then(base)
+            k >>= 1
+
+        return result
+
+
+# Compiled instruction: (op, target kind, ROW/COL number, amount). The number is 1-indexed, and 0 for `ALL`.
+Instruction = tuple[str, str, int, int]
+
+
+def compile_instruction(instruction: list[str]) -> Instruction:
+    """Compile the raw instruction tokens into an `Instruction`, so it is only parsed once."""
+    # Format: SHIFT ROW 3 BY 2
+    if instruction[0] == "SHIFT":
+        return "SHIFT", instruction[1], int(instruction[2]), int(instruction[-1])
+
+    if instruction[0] not in ("ADD", "SUB", "MULTIPLY"):
+        raise Exception("Invalid INSTRUCTION type.")
+
+    # Format: ADD 5 ALL
+    if instruction[2] == "ALL":
+        return instruction[0], "ALL", 0, int(instruction[1])
+
+    # Format: ADD 5 ROW 3
+    return instruction[0], instruction[2], int(instruction[-1]), int(instruction[1])
+
+
+def execute_action(grid: Grid, op: str, target: str, number: int, amount: int) -> None:
+    """Execute a compiled ADD/SUB/MULTIPLY instruction on the grid."""
+    if target == "ALL":
+        grid.do_all(amount=amount, type_=op)
     else:
-        # Perform on the given ROW/COL
-        instr: str = instruction[0]
-        amount: int = int(instruction[1])
-        is_row: bool = instruction[2] == "ROW"
-        row_col: int = int(instruction[-1])
+        grid.do_row_col_action(amount=amount, type_=op, is_row=target == "ROW", row_col=number)
+
 
-        do_row_col_action(grid=grid, amount=amount, size=size, type_=instr, is_row=is_row, row_col=row_col)
+def execute_shift(grid: Grid, op: str, target: str, number: int, amount: int) -> None:
+    """Execute a compiled SHIFT instruction on the grid."""
+    grid.do_shift(type_=target, row_col_number=number, shift_amount=amount)
 
 
-def get_highest_row_col_sum(grid: dict[tuple[int, int], int], size: int) -> int:
-    """Get the highest sum of the ROWS/COLS."""
-    row_col_sum_values: list[int] = []
+INSTRUCTION_TABLE: dict[str, Callable[[Grid, str, str, int, int], None]] = {
+    "ADD": execute_action,
+    "SUB": execute_action,
+    "MULTIPLY": execute_action,
+    "SHIFT": execute_shift,
+}
 
-    for i in range(size):
-        row: int = 0
-        col: int = 0
 
-        for j in range(size):
-            row += grid[(i, j)]
-            col += grid[(j, i)]
+def do_instruction(instruction: Instruction, grid: Grid) -> None:
+    """Perform the given compiled instruction on the grid."""
+    INSTRUCTION_TABLE[instruction[0]](grid, *instruction)
 
-        row_col_sum_values.append(row)
-        row_col_sum_values.append(col)
 
-    return max(row_col_sum_values)
+# Rolling fingerprint of the instruction queue, modulo a Mersenne prime.
+HASH_MODULO: int = (1 << 61) - 1
+HASH_BASE: int = 1_000_003
+HASH_INVERSE: int = pow(HASH_BASE, -1, HASH_MODULO)
 
 
 def do_actions(
-    grid: dict[tuple[int, int], int],
-    size: int,
+    grid: Grid,
     actions: list[str],
-    instructions: list[list[str]],
+    instructions: list[Instruction],
     exhaust: bool = False,
+    steps: int | None = None,
 ) -> None:
-    """Perform all the ACTIONs on the instruction set."""
+    """Perform all the ACTIONs on the instruction set, stopping after `steps` ACTIONs if given.
+
+    In `exhaust` mode with a `steps` limit, cycles are detected with Brent's algorithm. The state at the start of every
+    round of ACTIONs is fingerprinted in O(1), from the held instruction and a rolling hash of the queue, and compared
+    against a single snapshot that is moved forward whenever the rounds since it reach a power of two. A match is
+    confirmed by comparing the full state one period later. The instructions executed over that period are then
+    composed into a `Transform` and applied for all remaining whole periods at once.
+    """
+    dq_instructions: deque[int] = deque(range(len(instructions)))  # Indices into `instructions`
     dq_actions: deque[str] = deque(actions)
-    dq_instructions: deque[list[str]] = deque(instructions)
 
-    instruction: list[str] = []
-    while dq_actions:
-        if exhaust and not dq_instructions and not instruction:
+    # Cycle detection
+    detect: bool = exhaust and steps is not None
+    queue_hash: int = 0  # sum(dq_instructions[i] * HASH_BASE^i)
+    tail_power: int = 1  # HASH_BASE^len(dq_instructions)
+    if detect:
+        for i in dq_instructions:
+            queue_hash = (queue_hash + i * tail_power) % HASH_MODULO
+            tail_power = tail_power * HASH_BASE % HASH_MODULO
+
+    executed: list[int] = []
+    snapshot: tuple[int | None, int, int] | None = None
+    snapshot_step: int = 0
+    limit: int = 0
+    confirm: tuple[int, int, tuple[int | None, tuple[int, ...]]] | None = None  # (period, start step, full state)
+
+    instruction: int | None = None
+    step: int = 0
+    while dq_actions and (steps is None or step < steps):
+        if exhaust and not dq_instructions and instruction is None:
             break
 
+        if detect and step % len(actions) == 0:
+            fingerprint: tuple[int | None, int, int] = (instruction, len(dq_instructions), queue_hash)
+
+            if confirm is not None:
+                period, start, state = confirm
+
+                if step - start == period:
+                    confirm = None
+
+                    if (instruction, tuple(dq_instructions)) == state:
+                        transform: Transform = Transform.from_instructions(
+                            size=grid.size, instructions=[instructions[i] for i in executed]
+                        )
+
+                        # Fast-forward, and simulate whatever is left of the last period.
+                        repeats: int = (cast(int, steps) - step) // period
+                        grid.apply_transform(transform=transform.power(k=repeats))
+                        step += repeats * period
+                        detect = False
+
+                        if step == steps:
+                            break
+
+                    else:
+                        # Fingerprint collision, start over from here.
+                        snapshot = None
+
+            elif fingerprint == snapshot:
+                # Confirm the candidate period by running it once more, keeping only its instructions.
+                confirm = (step - snapshot_step, step, (instruction, tuple(dq_instructions)))
+                executed.clear()
+
+            # A state can only repeat while the queue keeps the same length.
+            if (
+                confirm is None
+                and detect
+                and (snapshot is None or snapshot[1] != len(dq_instructions) or step - snapshot_step == limit)
+            ):
+                limit = 2 * limit if snapshot is not None and snapshot[1] == len(dq_instructions) else len(actions)
+                snapshot = fingerprint
+                snapshot_step = step
+                executed.clear()
+
         curr: str = dq_actions.popleft()
 
         if curr == "TAKE":
             instruction = dq_instructions.popleft()
 
+            if detect:
+                queue_hash = (queue_hash - instruction) * HASH_INVERSE % HASH_MODULO
+                tail_power = tail_power * HASH_INVERSE % HASH_MODULO
+
         elif curr == "CYCLE":
-            dq_instructions.append(instruction)
+            if instruction is not None:
+                dq_instructions.append(instruction)
+
+                if detect:
+                    queue_hash = (queue_hash + instruction * tail_power) % HASH_MODULO
+                    tail_power = tail_power * HASH_BASE % HASH_MODULO
 
         elif curr == "ACT":
             # Perform the action.
-            do_instruction(instruction=instruction, grid=grid, size=size)
-            instruction = []
+            if instruction is not None:
+                do_instruction(instruction=instructions[instruction], grid=grid)
+
+                if detect:
+                    executed.append(instruction)
+
+            instruction = None
 
         else:
             assert "Invalid ACTION type."
 
+        step += 1
+
         # Part 03
         if exhaust:
             dq_actions.append(curr)
 
 
-def part_01(grid: dict[tuple[int, int], int], size: int, instructions: list[list[str]]) -> int:
+def part_01(grid: Grid, instructions: list[Instruction]) -> int:
     """Solve Part 01 of the problem."""
     for instruction in instructions:
-        do_instruction(instruction=instruction, grid=grid, size=size)
+        do_instruction(instruction=instruction, grid=grid)
 
-    return get_highest_row_col_sum(grid=grid, size=size)
+    return grid.get_highest_row_col_sum()
 
 
-def part_02(grid: dict[tuple[int, int], int], size: int, instructions: list[list[str]], actions: list[str]) -> int:
+def part_02(grid: Grid, instructions: list[Instruction], actions: list[str]) -> int:
     """Solve Part 02 of the problem."""
-    do_actions(grid=grid, size=size, instructions=instructions, actions=actions)
-    return get_highest_row_col_sum(grid=grid, size=size)
+    do_actions(grid=grid, instructions=instructions, actions=actions)
+    return grid.get_highest_row_col_sum()
 
 
-def part_03(grid: dict[tuple[int, int], int], size: int, instructions: list[list[str]], actions: list[str]) -> int:
+def part_03(grid: Grid, instructions: list[Instruction], actions: list[str]) -> int:
     """Solve Part 03 of the problem."""
-    do_actions(grid=grid, size=size, instructions=instructions, actions=actions, exhaust=True)
-    return get_highest_row_col_sum(grid=grid, size=size)
+    do_actions(grid=grid, instructions=instructions, actions=actions, exhaust=True)
+    return grid.get_highest_row_col_sum()
 
 
 def solve() -> None:
@@ -190,22 +479,22 @@ def solve() -> None:
     sections: list[str] = open(file).read().strip().split("\n\n")
 
     grid_values: list[list[str]] = [line.strip().split(" ") for line in sections[0].split("\n")]
-    grid_original: dict[tuple[int, int], int] = {
-        (x, y): int(grid_values[x][y]) for x in range(size) for y in range(size)
-    }
+    grid_original: Grid = Grid(size=size, values=(int(grid_values[x][y]) for x in range(size) for y in range(size)))
 
-    instructions: list[list[str]] = [line.strip().split(" ") for line in sections[1].split("\n")]
+    instructions: list[Instruction] = [
+        compile_instruction(instruction=line.strip().split(" ")) for line in sections[1].split("\n")
+    ]
 
     flow_controls: list[str] = [x.strip() for x in sections[-1].strip().split("\n")]
 
     # Part 01
-    p1: int = part_01(grid=deepcopy(grid_original), instructions=instructions, size=size)
+    p1: int = part_01(grid=grid_original.copy(), instructions=instructions)
 
     # Part 02
-    p2: int = part_02(grid=deepcopy(grid_original), actions=flow_controls, instructions=instructions, size=size)
+    p2: int = part_02(grid=grid_original.copy(), actions=flow_controls, instructions=instructions)
 
     # Part 03
-    p3: int = part_03(grid=deepcopy(grid_original), actions=flow_controls, instructions=instructions, size=size)
+    p3: int = part_03(grid=grid_original.copy(), actions=flow_controls, instructions=instructions)
 
     print(f"Part 01: {p1}")
     print(f"Part 02: {p2}")
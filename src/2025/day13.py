@@ -1,63 +1,286 @@
 #!/usr/bin/env python
+from __future__ import annotations
+
+import heapq
 import math
-from collections import defaultdict, deque
+from array import array
+from collections.abc import Iterable
+
+
+class LocationGraph:
+    """Location map, with the location names interned to dense indices and the routes packed as CSR arrays.
+
+    The routes leaving location `i` are `targets[offsets[i] : offsets[i + 1]]`, with the matching `weights`.
+    """
+
+    def __init__(self, names: list[str], offsets: array[int], targets: array[int], weights: array[int]) -> None:
+        self.names: list[str] = names
+        self.offsets: array[int] = offsets
+        self.targets: array[int] = targets
+        self.weights: array[int] = weights
+        self.__indices: dict[str, int] = {name: i for i, name in enumerate(names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, name: str) -> int:
+        """Get the index of the given location."""
+        return self.__indices[name]
+
+    @classmethod
+    def from_routes(cls, routes: Iterable[tuple[str, str, int]]) -> LocationGraph:
+        """Build the graph from (start, end, value) routes."""
+        indices: dict[str, int] = {}
+        starts: array[int] = array("q")
+        targets: array[int] = array("q")
+        weights: array[int] = array("q")
+
+        for start, end, value in routes:
+            starts.append(indices.setdefault(start, len(indices)))
+            targets.append(indices.setdefault(end, len(indices)))
+            weights.append(value)
+
+        # Counting sort of the routes by their start
+        offsets: array[int] = array("q", [0]) * (len(indices) + 1)
+        for start in starts:
+            offsets[start + 1] += 1
+
+        for i in range(len(indices)):
+            offsets[i + 1] += offsets[i]
+
+        position: array[int] = offsets[:-1]
+        packed_targets: array[int] = array("q", [0]) * len(targets)
+        packed_weights: array[int] = array("q", [0]) * len(weights)
+
+        for start, end, value in zip(starts, targets, weights):
+            packed_targets[position[start]] = end
+            packed_weights[position[start]] = value
+            position[start] += 1
+
+        return cls(names=list(indices), offsets=offsets, targets=packed_targets, weights=packed_weights)
+
+    @classmethod
+    def from_location_map(cls, location_map: dict[str, list[tuple[str, int]]]) -> LocationGraph:
+        """Build the graph from a map of each location to its (end, value) routes."""
+        return cls.from_routes((start, end, value) for start, nxt in location_map.items() for end, value in nxt)
 
 
-def get_product_highest_three_shortest_paths(
-    location_map: dict[str, list[tuple[str, int]]], use_values: bool = False
-) -> int:
-    """Solve Part 01."""
-    # Simply traversing problem, keeping track of the path that has been taken.
-    seen: set[str] = set()
-    all_paths: list[int] = []
+def find_shortest_distances(graph: LocationGraph, source: int, use_values: bool = False) -> array[int]:
+    """Dijkstra from the `source` location, with unit weights unless `use_values`.
 
-    q: deque[tuple[str, int]] = deque([("STT", 0)])
+    Returns the shortest distance to every location, with -1 for locations that cannot be reached.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist: array[int] = array("q", [-1]) * len(graph)
+    dist[source] = 0
+    q: list[tuple[int, int]] = [(0, source)]
 
     while q:
-        pos, lngth = q.popleft()
+        lngth, pos = heapq.heappop(q)
+
+        # Stale entry, already settled with a shorter length
+        if lngth != dist[pos]:
+            continue
+
+        for e in range(offsets[pos], offsets[pos + 1]):
+            nxt: int = targets[e]
+            new_lngth: int = lngth + (weights[e] if use_values else 1)
+
+            if dist[nxt] == -1 or new_lngth < dist[nxt]:
+                dist[nxt] = new_lngth
+                heapq.heappush(q, (new_lngth, nxt))
+
+    return dist
+
+
+def get_product_highest_three_shortest_paths(graph: LocationGraph, use_values: bool = False) -> int:
+    """Get the product of the three longest shortest paths from `STT`."""
+    dist: array[int] = find_shortest_distances(graph=graph, source=graph.index("STT"), use_values=use_values)
+
+    return math.prod(heapq.nlargest(3, (d for d in dist if d != -1)))
+
+
+HELD_KARP_LIMIT: int = 12  # Largest component solved with the bitmask DP, branch-and-bound above that.
+
+
+def find_strongly_connected_components(graph: LocationGraph) -> list[list[int]]:
+    """Iterative Tarjan's algorithm, returning the locations of each strongly connected component."""
+    offsets, targets = graph.offsets, graph.targets
+    index: list[int] = [-1] * len(graph)
+    low: list[int] = [0] * len(graph)
+    on_stack: list[bool] = [False] * len(graph)
+    stack: list[int] = []
+    components: list[list[int]] = []
+    counter: int = 0
+
+    for root in range(len(graph)):
+        if index[root] != -1:
+            continue
+
+        work: list[tuple[int, int]] = [(root, -1)]  # (location, next route), -1 when not visited yet
+        while work:
+            pos, edge = work.pop()
+
+            if edge == -1:
+                edge = offsets[pos]
+                index[pos] = low[pos] = counter
+                counter += 1
+                stack.append(pos)
+                on_stack[pos] = True
+
+            # Recurse into the next unvisited location, if any
+            recurse: bool = False
+            for e in range(edge, offsets[pos + 1]):
+                nxt: int = targets[e]
 
-        if pos not in seen:
-            seen.add(pos)
-            all_paths.append(lngth)
+                if index[nxt] == -1:
+                    work.append((pos, e + 1))
+                    work.append((nxt, -1))
+                    recurse = True
+                    break
 
-            for nxt, value in location_map[pos]:
-                q.append((nxt, lngth + (value**use_values)))
+                if on_stack[nxt]:
+                    low[pos] = min(low[pos], index[nxt])
 
-    return math.prod(sorted(all_paths)[-3:])
+            if recurse:
+                continue
+
+            # Root of a component
+            if low[pos] == index[pos]:
+                component: list[int] = []
+                while True:
+                    x: int = stack.pop()
+                    on_stack[x] = False
+                    component.append(x)
+
+                    if x == pos:
+                        break
+
+                components.append(component)
+
+            if work:
+                parent: int = work[-1][0]
+                low[parent] = min(low[parent], low[pos])
+
+    return components
+
+
+def get_component_edges(graph: LocationGraph, component: list[int]) -> list[dict[int, int]]:
+    """Get the edges within the component, on local indices, keeping the heaviest of any parallel edges."""
+    local: dict[int, int] = {pos: i for i, pos in enumerate(component)}
+    edges: list[dict[int, int]] = [{} for _ in component]
+
+    for i, pos in enumerate(component):
+        for e in range(graph.offsets[pos], graph.offsets[pos + 1]):
+            nxt, value = graph.targets[e], graph.weights[e]
+
+            if nxt in local:
+                j: int = local[nxt]
+                edges[i][j] = max(edges[i].get(j, 0), value)
+
+    return edges
+
+
+def get_longest_cycle_held_karp(edges: list[dict[int, int]]) -> int:
+    """Longest simple cycle in a small component, by bitmask DP over the visited locations.
+
+    Every cycle is counted from its lowest location, so `dp[mask][v]` is the longest path from the lowest location in
+    `mask` to `v`, visiting exactly the locations in `mask`.
+    """
+    n: int = len(edges)
+    dp: list[list[int]] = [[-1] * n for _ in range(1 << n)]
+    best: int = 0
+
+    for s in range(n):
+        dp[1 << s][s] = 0
 
+    for mask in range(1, 1 << n):
+        start: int = (mask & -mask).bit_length() - 1
 
-def get_longest_cycle(location_map: dict[str, list[tuple[str, int]]]) -> int:
-    """Determine the longest cycle. Locations can only be visited once."""
-    unique_locations: set[str] = set(location_map.keys())
+        for v in range(n):
+            lngth: int = dp[mask][v]
+            if lngth == -1:
+                continue
+
+            for nxt, value in edges[v].items():
+                if nxt == start:
+                    best = max(best, lngth + value)
+
+                elif nxt > start and not mask & (1 << nxt):
+                    dp[mask | (1 << nxt)][nxt] = max(dp[mask | (1 << nxt)][nxt], lngth + value)
+
+    return best
+
+
+def get_longest_cycle_branch_and_bound(edges: list[dict[int, int]]) -> int:
+    """Longest simple cycle in a component, by DFS from each location over the higher locations only.
+
+    A path is pruned once its length, plus the heaviest incoming edge of every location that could still be added
+    and of the start, cannot beat the best cycle found so far.
+    """
+    n: int = len(edges)
+    max_in: list[int] = [0] * n
+    for v in range(n):
+        for nxt, value in edges[v].items():
+            max_in[nxt] = max(max_in[nxt], value)
+
+    best: int = 0
+    visited: list[bool] = [False] * n
 
-    for nxt in location_map.values():
-        for x, _ in nxt:
-            unique_locations.add(x)
+    for start in range(n):
+        remaining: int = sum(max_in[start + 1 :])
+        if remaining + max_in[start] <= best:
+            continue
 
-    all_paths: list[int] = []
+        visited[start] = True
+        lengths: list[int] = [0]
+        stack: list[tuple[int, list[tuple[int, int]]]] = [(start, list(edges[start].items()))]
 
-    for start in unique_locations:
-        # Go through each new location and determine if it is cycle
-        seen: set[str] = set()
+        while stack:
+            pos, to_visit = stack[-1]
 
-        q: deque[tuple[str, int]] = deque([(start, 0)])
+            if not to_visit:
+                stack.pop()
+                lengths.pop()
+                visited[pos] = False
 
-        while q:
-            pos, lngth = q.popleft()
+                if pos != start:
+                    remaining += max_in[pos]
 
-            # Checking if valid
-            if pos == start and start in seen:
-                # Valid path
-                all_paths.append(lngth)
                 continue
 
-            if pos not in seen:
-                seen.add(pos)
+            nxt, value = to_visit.pop()
+            lngth: int = lengths[-1] + value
+
+            if nxt == start:
+                best = max(best, lngth)
+
+            elif nxt > start and not visited[nxt] and lngth + remaining - max_in[nxt] + max_in[start] > best:
+                visited[nxt] = True
+                remaining -= max_in[nxt]
+                lengths.append(lngth)
+                stack.append((nxt, list(edges[nxt].items())))
+
+    return best
+
+
+def get_longest_cycle(graph: LocationGraph) -> int:
+    """Determine the longest cycle. Locations can only be visited once.
+
+    Cycles never leave a strongly connected component, so each component is solved on its own: exactly by bitmask DP
+    when small, and by branch-and-bound otherwise. Returns 0 if there is no cycle.
+    """
+    best: int = 0
+
+    for component in find_strongly_connected_components(graph=graph):
+        edges: list[dict[int, int]] = get_component_edges(graph=graph, component=component)
 
-                for nxt, value in location_map[pos]:
-                    q.append((nxt, lngth + value))
+        if len(component) <= HELD_KARP_LIMIT:
+            best = max(best, get_longest_cycle_held_karp(edges=edges))
+        else:
+            best = max(best, get_longest_cycle_branch_and_bound(edges=edges))
 
-    return max(all_paths)
+    return best
 
 
 def solve() -> None:
@@ -69,18 +292,16 @@ def solve() -> None:
         line.strip().replace(" -> ", " ").replace(" | ", " ").split() for line in open(file).readlines()
     ]
 
-    location_map: dict[str, list[tuple[str, int]]] = defaultdict(list)
-    for start, end, value in data:
-        location_map[start].append((end, int(value)))
+    graph: LocationGraph = LocationGraph.from_routes((start, end, int(value)) for start, end, value in data)
 
     # Part 01
-    p1: int = get_product_highest_three_shortest_paths(location_map=location_map)
+    p1: int = get_product_highest_three_shortest_paths(graph=graph)
 
     # Part 02
-    p2: int = get_product_highest_three_shortest_paths(location_map=location_map, use_values=True)
+    p2: int = get_product_highest_three_shortest_paths(graph=graph, use_values=True)
 
     # Part 03
-    p3: int = get_longest_cycle(location_map=location_map)
+    p3: int = get_longest_cycle(graph=graph)
 
     print(f"Part 01: {p1}")
     print(f"Part 02: {p2}")
@@ -1,7 +1,17 @@
 #!/usr/bin/env python
+import heapq
 import re
+from bisect import bisect_right
+from collections.abc import Iterable
 from dataclasses import dataclass, field
-from typing import Any
+from itertools import accumulate, repeat
+from operator import add, itemgetter
+from typing import Any, cast
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only required for the vectorised kernel.
+    np = cast(Any, None)
 
 
 @dataclass(frozen=True)
@@ -15,31 +25,186 @@ class Item:
     materials: int = field()
 
 
-def max_items_value(items: list[Item], cost_target: int) -> int:
-    """Simple DP approach to finding the combination of Items that reach the target goal."""
-    # Processing
-    dp: list[Any] = [None for _ in range(cost_target + 1)]
-    dp[0] = (0, 0)  # best combo (best_quality, least_materials)
+MATERIALS_BITS: int = 32  # Initial width of the materials field, widened once the materials could overflow it
+UNREACHABLE: int = -(1 << 62)
+
+
+def pack_score(quality: int, materials: int, materials_bits: int = MATERIALS_BITS) -> int:
+    """Pack a (quality, materials) combination into a single integer, preserving the tuple ordering.
+
+    The ordering only holds while every materials total fits within `materials_bits`.
+    """
+    return (quality << materials_bits) | materials
+
+
+def unpack_score(score: int, materials_bits: int = MATERIALS_BITS) -> tuple[int, int]:
+    """Unpack a score into its (quality, materials) combination."""
+    return score >> materials_bits, score & ((1 << materials_bits) - 1)
+
+
+def repack_score(score: int, materials_bits: int, new_bits: int) -> int:
+    """Move a packed score to a wider materials field."""
+    return pack_score(*unpack_score(score=score, materials_bits=materials_bits), materials_bits=new_bits)
+
+
+class Knapsack:
+    """0/1 knapsack DP over exact total costs, built once up to `max_budget` and shared by every smaller budget.
+
+    `dp[c]` is the best (quality, materials) combination costing exactly `c`, packed into a single integer score, or
+    negative when no combination costs exactly `c`. Adding an Item is then a single shifted maximum over the cost
+    axis, done with `np.maximum` when `use_numpy`. Items can be added at any time, and the best combination within
+    each budget is a prefix-max over `dp`, recomputed lazily after new items.
+
+    The materials field is widened, and the table re-packed, whenever the total materials of the Items no longer fit.
+    """
+
+    def __init__(self, max_budget: int, items: Iterable[Item] = (), use_numpy: bool = False) -> None:
+        if use_numpy and np is None:
+            raise Exception("NumPy is required for the vectorised kernel.")
+
+        self.max_budget: int = max_budget
+        self.__use_numpy: bool = use_numpy
+        self.__materials_bits: int = MATERIALS_BITS
+        self.__quality: int = 0  # Total quality of the Items
+        self.__materials: int = 0  # Total materials of the Items
+
+        self.__dp: Any = (
+            np.full(max_budget + 1, UNREACHABLE, dtype=np.int64) if use_numpy else [UNREACHABLE] * (max_budget + 1)
+        )
+        self.__dp[0] = pack_score(quality=0, materials=0)  # best combo (best_quality, most_materials)
+        self.__best: Any = None
+
+        for item in items:
+            self.add_item(item=item)
+
+    def add_item(self, item: Item) -> None:
+        """Add the item to the DP table."""
+        self.__quality += item.quality
+        self.__materials += item.materials
+        bits: int = max(self.__materials_bits, self.__materials.bit_length())
+
+        # The sum of all the scores must stay below the sentinel, so unreachable costs can never look reachable.
+        if pack_score(quality=self.__quality, materials=self.__materials, materials_bits=bits) >= -UNREACHABLE:
+            raise Exception("Scores are too large to pack.")
+
+        if bits != self.__materials_bits:
+            self.__repack(bits=bits)
+
+        score: int = pack_score(quality=item.quality, materials=item.materials, materials_bits=bits)
+
+        # Every combination costing `c`, extended with the item, now costs `c + item.cost`.
+        lngth: int = self.max_budget + 1 - item.cost
+        if lngth > 0:
+            dp: Any = self.__dp
+
+            if self.__use_numpy:
+                dp[item.cost :] = np.maximum(dp[item.cost :], dp[:lngth] + score)
+            else:
+                dp[item.cost :] = list(map(max, dp[item.cost :], map(add, dp[:lngth], repeat(score))))
+
+        self.__best = None
 
-    for item in items:
-        for total_cost in range(cost_target, -1, -1):  # reverse to not add items twice
-            # Have combination and is valid
-            if total_cost + item.cost <= cost_target and dp[total_cost] is not None:
-                curr_quality, curr_materials = dp[total_cost]
-                new_value: tuple[int, int] = (curr_quality + item.quality, curr_materials + item.materials)
+    def __repack(self, bits: int) -> None:
+        """Re-pack every reachable score with a `bits` wide materials field."""
+        dp: Any = self.__dp
+        old: int = self.__materials_bits
 
-                if dp[total_cost + item.cost] is None:
-                    dp[total_cost + item.cost] = new_value
-                else:
-                    dp[total_cost + item.cost] = max(dp[total_cost + item.cost], new_value)
+        if self.__use_numpy:
+            reachable: Any = dp >= 0
+            dp[reachable] = ((dp[reachable] >> old) << bits) | (dp[reachable] & ((1 << old) - 1))
+        else:
+            self.__dp = [repack_score(score=s, materials_bits=old, new_bits=bits) if s >= 0 else s for s in dp]
 
-    best_choice: tuple[int, int] | None = None
+        self.__materials_bits = bits
 
-    for i in range(cost_target + 1):
-        if dp[i] is not None and (best_choice is None or dp[i] > best_choice):
-            best_choice = dp[i]
+    def max_value(self, budget: int) -> int:
+        """Get the value (quality * materials) of the best combination of Items costing at most `budget`."""
+        if not 0 <= budget <= self.max_budget:
+            raise Exception(f"Budget must be between 0 and {self.max_budget}.")
 
-    return best_choice[0] * best_choice[1] if best_choice is not None else -1
+        if self.__best is None:
+            self.__best = np.maximum.accumulate(self.__dp) if self.__use_numpy else list(accumulate(self.__dp, max))
+
+        best: int = int(self.__best[budget])
+        if best < 0:
+            return -1
+
+        quality, materials = unpack_score(score=best, materials_bits=self.__materials_bits)
+        return quality * materials
+
+
+class ParetoKnapsack:
+    """0/1 knapsack keeping only the Pareto frontier of (cost, score) states, for budgets far beyond the item costs.
+
+    A state is dropped once another state costs no more and scores at least as much. The frontier is kept sorted by
+    cost with strictly increasing scores, so its size never depends on the budget, and the best combination within a
+    budget is the last state that fits. Scores are re-packed like in `Knapsack` when the materials outgrow their field.
+    """
+
+    def __init__(self, max_budget: int, items: Iterable[Item] = ()) -> None:
+        self.max_budget: int = max_budget
+        self.__states: list[tuple[int, int]] = [(0, pack_score(quality=0, materials=0))]
+        self.__materials_bits: int = MATERIALS_BITS
+        self.__materials: int = 0  # Total materials of the Items
+
+        for item in items:
+            self.add_item(item=item)
+
+    def add_item(self, item: Item) -> None:
+        """Merge the states extended with the item into the frontier, pruning the dominated ones."""
+        self.__materials += item.materials
+        bits: int = max(self.__materials_bits, self.__materials.bit_length())
+        if bits != self.__materials_bits:
+            self.__states = [
+                (cost, repack_score(score=s, materials_bits=self.__materials_bits, new_bits=bits))
+                for cost, s in self.__states
+            ]
+            self.__materials_bits = bits
+
+        score: int = pack_score(quality=item.quality, materials=item.materials, materials_bits=bits)
+        extended: list[tuple[int, int]] = [
+            (cost + item.cost, s + score) for cost, s in self.__states if cost + item.cost <= self.max_budget
+        ]
+
+        states: list[tuple[int, int]] = []
+        for cost, s in heapq.merge(self.__states, extended, key=lambda state: (state[0], -state[1])):
+            if not states or s > states[-1][1]:
+                states.append((cost, s))
+
+        self.__states = states
+
+    def max_value(self, budget: int) -> int:
+        """Get the value (quality * materials) of the best combination of Items costing at most `budget`."""
+        if not 0 <= budget <= self.max_budget:
+            raise Exception(f"Budget must be between 0 and {self.max_budget}.")
+
+        _, best = self.__states[bisect_right(self.__states, budget, key=itemgetter(0)) - 1]
+        quality, materials = unpack_score(score=best, materials_bits=self.__materials_bits)
+        return quality * materials
+
+
+DENSE_TABLE_LIMIT: int = 1 << 22  # Largest dense DP table, in entries, before always using the frontier
+
+
+def build_knapsack(items: list[Item], max_budget: int) -> Knapsack | ParetoKnapsack:
+    """Build the knapsack best suited to the budget: the dense DP, or the frontier when it is the smaller of the two.
+
+    The frontier never holds more than `2^len(items)` states, while the dense table always holds `max_budget + 1`.
+    """
+    table: int = max_budget + 1
+    if table > DENSE_TABLE_LIMIT or 1 << len(items) < table:
+        return ParetoKnapsack(max_budget=max_budget, items=items)
+
+    return Knapsack(max_budget=max_budget, items=items)
+
+
+def max_items_value(items: list[Item], cost_target: int) -> int:
+    """Simple DP approach to finding the combination of Items that reach the target goal."""
+    # Every Item fits, so taking all of them is the best combination.
+    if cost_target >= sum(item.cost for item in items):
+        return sum(item.quality for item in items) * sum(item.materials for item in items)
+
+    return build_knapsack(items=items, max_budget=cost_target).max_value(budget=cost_target)
 
 
 def solve() -> None:
@@ -60,11 +225,14 @@ def solve() -> None:
     # Part 01
     p1: int = sum(x.materials for x in sorted(items, key=lambda x: (x.quality, x.cost))[-5:])
 
+    # Part 02, 03 share a single DP table
+    knapsack: Knapsack | ParetoKnapsack = build_knapsack(items=items, max_budget=300)
+
     # Part 02
-    p2: int = max_items_value(items=items, cost_target=30)
+    p2: int = knapsack.max_value(budget=30)
 
     # Part 03
-    p3: int = max_items_value(items=items, cost_target=300)
+    p3: int = knapsack.max_value(budget=300)
 
     print(f"Part 01: {p1}")
     print(f"Part 02: {p2}")
@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 from __future__ import annotations
 
+import mmap
+import struct
+import sys
+from array import array
 from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
+from typing import cast
+
+# Snapshot header: magic, little endian flag, number of nodes, length of the names blob
+SNAPSHOT_HEADER: struct.Struct = struct.Struct("<4sIQQ")
+SNAPSHOT_MAGIC: bytes = b"D15T"
 
 
 @dataclass(eq=True, frozen=True)
@@ -22,20 +32,25 @@ class Node:
     right: Node | None = field(default=None)
 
     def insert(self, value: Artifact) -> None:
-        """Inserting a new node."""
-        # print(self.value.name, end="-") # For p2
-        if value.id_ < self.value.id_:
-            # Insert on the left
-            if not self.left:
-                self.left = Node(value=value)
-            else:
-                self.left.insert(value=value)
+        """Inserting a new node, walking down iteratively."""
+        node: Node = self
+
+        while True:
+            # print(node.value.name, end="-") # For p2
+            if value.id_ < node.value.id_:
+                # Insert on the left
+                if not node.left:
+                    node.left = Node(value=value)
+                    return
+
+                node = node.left
 
-        else:
-            if not self.right:
-                self.right = Node(value=value)
             else:
-                self.right.insert(value=value)
+                if not node.right:
+                    node.right = Node(value=value)
+                    return
+
+                node = node.right
 
 
 class BST:
@@ -44,6 +59,33 @@ class BST:
     def __init__(self, value: Artifact | None = None) -> None:
         self.root: Node | None = Node(value=value) if value else None
 
+    @classmethod
+    def from_artifacts(cls, artifacts: list[Artifact]) -> BST:
+        """Build the BST with the same shape as inserting the artifacts one by one, in O(n log n).
+
+        The tree is the Cartesian tree of the artifacts ordered by (id, insertion order), with the insertion order as
+        the heap priority. Equal ids sort by insertion order, matching later duplicates being inserted on the right.
+        """
+        tree: BST = cls()
+        spine: list[tuple[int, Node]] = []  # Right spine of the tree: (insertion order, node)
+
+        for order, artifact in sorted(enumerate(artifacts), key=lambda x: (x[1].id_, x[0])):
+            node: Node = Node(value=artifact)
+
+            # Anything inserted later than the new node hangs below it
+            last: Node | None = None
+            while spine and spine[-1][0] > order:
+                last = spine.pop()[1]
+
+            node.left = last
+            if spine:
+                spine[-1][1].right = node
+
+            spine.append((order, node))
+
+        tree.root = spine[0][1] if spine else None
+        return tree
+
     def insert(self, value: Artifact) -> None:
         """Insert a new node into the BST."""
         if not self.root:
@@ -73,6 +115,17 @@ class BST:
 
         return res
 
+    def iter_levels(self) -> Iterator[tuple[int, int, int]]:
+        """Yield (level, sum of ids, number of artifacts) for each level, keeping only one level in memory."""
+        level: list[Node] = [self.root] if self.root is not None else []
+        layer: int = 1
+
+        while level:
+            yield layer, sum(node.value.id_ for node in level), len(level)
+
+            level = [child for node in level for child in (node.left, node.right) if child is not None]
+            layer += 1
+
     def dfs_to_target(self, target: int) -> list[Artifact]:
         """Perform a DFS to get the path to a certain target."""
         res: list[Artifact] = []
@@ -102,6 +155,253 @@ class BST:
         return res
 
 
+class CompactBST:
+    """Binary Search Tree stored in parallel arrays, with nodes referred to by their index (insertion order).
+
+    `ids`, `left`, `right` and `depth` hold one entry per node, with -1 for a missing child and a depth of 1 for the
+    root. The names are kept in a separate table.
+
+    A built tree can be saved to a binary snapshot: a fixed-size header, the four columns as native int64 arrays and
+    the newline-joined names. Loading with `use_mmap` maps the columns straight from the file, read-only.
+    """
+
+    def __init__(self) -> None:
+        self.ids: array[int] = array("q")
+        self.left: array[int] = array("q")
+        self.right: array[int] = array("q")
+        self.depth: array[int] = array("q")
+        self.names: list[str] = []
+        self.read_only: bool = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_artifact(self, node: int) -> Artifact:
+        """Get the Artifact stored at the given node."""
+        return Artifact(name=self.names[node], id_=self.ids[node])
+
+    def __add_node(self, value: Artifact, depth: int) -> int:
+        """Append a new, childless node."""
+        if self.read_only:
+            raise Exception("Memory-mapped trees are read-only.")
+
+        self.ids.append(value.id_)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.depth.append(depth)
+        self.names.append(value.name)
+        return len(self.ids) - 1
+
+    @classmethod
+    def from_artifacts(cls, artifacts: list[Artifact]) -> CompactBST:
+        """Build the tree with the same shape as inserting the artifacts one by one, in O(n log n).
+
+        Same Cartesian tree construction as `BST.from_artifacts`, with the depths filled in afterwards.
+        """
+        tree: CompactBST = cls()
+        for artifact in artifacts:
+            tree.__add_node(value=artifact, depth=0)
+
+        spine: list[int] = []  # Right spine of the tree; node indices are the insertion order
+        for node in sorted(range(len(artifacts)), key=lambda x: (artifacts[x].id_, x)):
+            # Anything inserted later than the new node hangs below it
+            last: int = -1
+            while spine and spine[-1] > node:
+                last = spine.pop()
+
+            tree.left[node] = last
+            if spine:
+                tree.right[spine[-1]] = node
+
+            spine.append(node)
+
+        # Depths, top-down
+        stack: list[tuple[int, int]] = [(spine[0], 1)] if spine else []
+        while stack:
+            node, depth = stack.pop()
+            tree.depth[node] = depth
+
+            for child in (tree.left[node], tree.right[node]):
+                if child != -1:
+                    stack.append((child, depth + 1))
+
+        return tree
+
+    def save(self, file: str) -> None:
+        """Save the tree to a binary snapshot."""
+        blob: bytes = "\n".join(self.names).encode()
+
+        with open(file, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, sys.byteorder == "little", len(self), len(blob)))
+
+            for column in (self.ids, self.left, self.right, self.depth):
+                f.write(column.tobytes())
+
+            f.write(blob)
+
+    @classmethod
+    def load(cls, file: str, use_mmap: bool = False) -> CompactBST:
+        """Load a tree from a binary snapshot. With `use_mmap`, the columns are read-only views of the file."""
+        with open(file, "rb") as f:
+            data: mmap.mmap | bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else f.read()
+
+        magic, little_endian, n, blob_length = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or little_endian != (sys.byteorder == "little"):
+            raise Exception("Invalid snapshot file.")
+
+        tree: CompactBST = cls()
+        view: memoryview = memoryview(data)
+        offset: int = SNAPSHOT_HEADER.size
+        columns: list[array[int]] = []
+
+        for _ in range(4):
+            chunk: memoryview = view[offset : offset + 8 * n]
+            columns.append(cast(array[int], chunk.cast("q")) if use_mmap else array("q", chunk.tobytes()))
+            offset += 8 * n
+
+        tree.ids, tree.left, tree.right, tree.depth = columns
+        tree.names = bytes(view[offset : offset + blob_length]).decode().split("\n") if n else []
+        tree.read_only = use_mmap
+
+        return tree
+
+    def insert(self, value: Artifact) -> int:
+        """Insert a new node into the tree, returning its index."""
+        if not self.ids:
+            return self.__add_node(value=value, depth=1)
+
+        node: int = 0
+        while True:
+            children: array[int] = self.left if value.id_ < self.ids[node] else self.right
+
+            if children[node] == -1:
+                children[node] = self.__add_node(value=value, depth=self.depth[node] + 1)
+                return children[node]
+
+            node = children[node]
+
+    def bfs(self) -> dict[int, list[int]]:
+        """Perform a Breadth First Search on the Tree, returning a dictionary of the nodes on each level."""
+        res: dict[int, list[int]] = defaultdict(list)
+
+        if not self.ids:
+            return res
+
+        q: deque[int] = deque([0])
+
+        while q:
+            node: int = q.popleft()
+            res[self.depth[node]].append(node)
+
+            if self.left[node] != -1:
+                q.append(self.left[node])
+
+            if self.right[node] != -1:
+                q.append(self.right[node])
+
+        return res
+
+    def iter_levels(self) -> Iterator[tuple[int, int, int]]:
+        """Yield (level, sum of ids, number of nodes) for each level, keeping only one level in memory.
+
+        The level of every node is also available afterwards from `depth`, which the tree keeps up to date.
+        """
+        level: list[int] = [0] if self.ids else []
+        layer: int = 1
+
+        while level:
+            yield layer, sum(self.ids[node] for node in level), len(level)
+
+            level = [child for node in level for child in (self.left[node], self.right[node]) if child != -1]
+            layer += 1
+
+    def dfs_to_target(self, target: int) -> list[int]:
+        """Get the nodes on the path to a certain target, excluding the target itself."""
+        res: list[int] = []
+        node: int = 0 if self.ids else -1
+
+        while node != -1 and self.ids[node] != target:
+            res.append(node)
+            node = self.left[node] if target < self.ids[node] else self.right[node]
+
+        return res
+
+
+class LCAIndex:
+    """Binary lifting index over a finished `CompactBST`, for batched ancestor queries in O(log n) each.
+
+    `up[k][node]` is the ancestor `2**k` levels above the node, or the root once past it.
+    """
+
+    def __init__(self, tree: CompactBST) -> None:
+        self.tree: CompactBST = tree
+        self.parent: array[int] = array("q", [-1]) * len(tree)
+        self.node_of: dict[int, int] = {}  # First inserted node of each id, which is the one the DFS reaches
+
+        for node in range(len(tree)):
+            self.node_of.setdefault(tree.ids[node], node)
+
+            for child in (tree.left[node], tree.right[node]):
+                if child != -1:
+                    self.parent[child] = node
+
+        levels: int = max(1, max(tree.depth, default=1).bit_length())
+        self.up: list[array[int]] = [array("q", [p if p != -1 else node for node, p in enumerate(self.parent)])]
+
+        for k in range(1, levels):
+            prev: array[int] = self.up[k - 1]
+            self.up.append(array("q", [prev[prev[node]] for node in range(len(tree))]))
+
+    def lca(self, a: int, b: int) -> int:
+        """Get the lowest common ancestor of the two nodes (either node itself if it is an ancestor of the other)."""
+        depth: array[int] = self.tree.depth
+
+        if depth[a] < depth[b]:
+            a, b = b, a
+
+        # Lift `a` to the depth of `b`
+        diff: int = depth[a] - depth[b]
+        k: int = 0
+        while diff:
+            if diff & 1:
+                a = self.up[k][a]
+
+            diff >>= 1
+            k += 1
+
+        if a == b:
+            return a
+
+        for k in range(len(self.up) - 1, -1, -1):
+            if self.up[k][a] != self.up[k][b]:
+                a, b = self.up[k][a], self.up[k][b]
+
+        return self.up[0][a]
+
+    def __last_on_path(self, target: int) -> int:
+        """Get the deepest node of `dfs_to_target`, without materialising the path. -1 if the path is empty."""
+        if target in self.node_of:
+            return self.parent[self.node_of[target]]
+
+        # Not in the tree, so the path runs all the way down to a leaf
+        path: list[int] = self.tree.dfs_to_target(target=target)
+        return path[-1] if path else -1
+
+    def deepest_common_ancestor(self, id_a: int, id_b: int) -> int:
+        """Get the deepest node shared by the paths to both targets, as given by `dfs_to_target`. -1 if none."""
+        a: int = self.__last_on_path(target=id_a)
+        b: int = self.__last_on_path(target=id_b)
+
+        if a == -1 or b == -1:
+            return -1
+
+        return self.lca(a=a, b=b)
+
+    def deepest_common_ancestors(self, queries: Iterable[tuple[int, int]]) -> list[int]:
+        """Batched `deepest_common_ancestor` over (id_a, id_b) queries."""
+        return [self.deepest_common_ancestor(id_a=id_a, id_b=id_b) for id_a, id_b in queries]
+
+
 def solve() -> None:
     """Solve the problems."""
     use_example: bool = True
@@ -110,51 +410,38 @@ def solve() -> None:
     # Format: ozNxANO | 576690
     sections: list[str] = open(file).read().split("\n\n")
 
-    tree: BST = BST()
+    artifacts: list[Artifact] = []
     for artifact in sections[0].strip().split("\n"):
         name: str
         id_: str
         name, id_ = artifact.strip().split(" | ")
-        tree.insert(value=Artifact(name=name, id_=int(id_)))
+        artifacts.append(Artifact(name=name, id_=int(id_)))
+
+    tree: CompactBST = CompactBST.from_artifacts(artifacts=artifacts)
 
     requested_artifacts: list[Artifact] = [
         Artifact(name=name, id_=int(id_)) for name, id_ in [x.split(" | ") for x in sections[-1].strip().split("\n")]
     ]
 
     # Part 01
-    layers: dict[int, list[Artifact]] = tree.bfs()
-    artifact_layer: dict[Artifact, int] = {}
-
-    for k, v in layers.items():
-        for art in v:
-            artifact_layer[art] = k
+    largest_layer: int = 0
+    num_layers: int = 0
 
-    # Getting largest layer
-    largest_layer: int = max(sum(x.id_ for x in layer) for layer in layers.values())
-    num_layers: int = max(layers.keys())
+    for layer, id_sum, _ in tree.iter_levels():
+        largest_layer = max(largest_layer, id_sum)
+        num_layers = layer
 
     p1: int = largest_layer * num_layers
 
     # Part 02
-    # print("\n\n")
     tree.insert(value=Artifact(name="part2", id_=500000))
-    p2: str = "-".join([x.name for x in tree.dfs_to_target(target=500000)])
+    p2: str = "-".join([tree.names[x] for x in tree.dfs_to_target(target=500000)])
 
     # Part 03
-    request_01: set[Artifact] = set(tree.dfs_to_target(target=requested_artifacts[0].id_))
-    request_02: set[Artifact] = set(tree.dfs_to_target(target=requested_artifacts[1].id_))
-    common_ancestors: set[Artifact] = request_02 & request_01
-
-    # Find the one that is the deepest. We can reuse the layers dict
-    p3: str = ""
-    lngth: int = 0
-
-    for ca in common_ancestors:
-        layer: int = artifact_layer[ca]
-
-        if layer > lngth:
-            lngth = layer
-            p3 = ca.name
+    deepest: int = LCAIndex(tree=tree).deepest_common_ancestor(
+        id_a=requested_artifacts[0].id_, id_b=requested_artifacts[1].id_
+    )
+    p3: str = tree.names[deepest] if deepest != -1 else ""
 
     print(f"Part 01: {p1}")
     print(f"Part 02: {p2}")
@@ -3,41 +3,136 @@ from __future__ import annotations
 
 import math
 from copy import deepcopy
+from typing import Any, cast
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only required for the ndarray backend.
+    np = cast(Any, None)
 
 
 class Face:
-    """Face of a dice."""
+    """Face of a dice.
+
+    Rotations are tracked lazily through `orientation`, the number of clockwise quarter turns applied to the face
+    since its grid was last materialised. Logical (row, col) positions are mapped onto the physical grid on access.
+
+    FACE/ROW/COL updates are recorded as pending additive offsets (mod 100) on the physical grid, and are only
+    applied to the cells when the grid is read.
+
+    With `use_numpy`, the grid is stored as an ndarray: pending offsets are applied with a single broadcast, the
+    dominant sum uses axis reductions and rotations are served as `rot90` views.
+    """
+
+    def __init__(self, id_: int, size: int, use_numpy: bool = False) -> None:
+        if use_numpy and np is None:
+            raise Exception("NumPy is required for the ndarray backend.")
 
-    def __init__(self, id_: int, size: int) -> None:
         self.id_: int = id_
         self.__size: int = size
-        self.__grid: list[list[int]] = [[1 for _ in range(self.__size)] for _ in range(self.__size)]
+        self.__use_numpy: bool = use_numpy
+        self.__grid: list[list[int]] = (
+            [] if use_numpy else [[1 for _ in range(self.__size)] for _ in range(self.__size)]
+        )
+        self.__array: Any = np.ones((size, size), dtype=np.int64) if use_numpy else None
         self.__absorption: int = 0
+        self.__orientation: int = 0
+
+        # Pending offsets
+        self.__face_offset: int = 0
+        self.__row_offsets: list[int] = [0] * self.__size
+        self.__col_offsets: list[int] = [0] * self.__size
+        self.__has_pending: bool = False
 
     def get_dominant_sum(self) -> int:
-        """Get the dominant sum of the face."""
+        """Get the dominant sum of the face. Row and column sums are unaffected by rotation."""
+        self.__materialise()
+
+        if self.__use_numpy:
+            return int(max(self.__array.sum(axis=0).max(), self.__array.sum(axis=1).max()))
+
         return max(max(sum(row) for row in self.__grid), max(sum(col) for col in zip(*self.__grid)))
 
     def get_grid(self) -> list[list[int]]:
-        """Get a copy of the grid."""
+        """Get a copy of the grid, in its logical orientation."""
+        if self.__use_numpy:
+            return self.get_grid_view().tolist()
+
+        self.__materialise()
+        self.__reorient()
         return deepcopy(self.__grid)
 
+    def get_grid_view(self) -> Any:
+        """Get a read-only view of the grid, in its logical orientation. Requires the ndarray backend."""
+        if not self.__use_numpy:
+            raise Exception("Grid views are only available with the ndarray backend.")
+
+        self.__materialise()
+        view: Any = np.rot90(self.__array, k=-self.__orientation)
+        view.flags.writeable = False
+        return view
+
     def get_absorption(self) -> int:
         """Get the absorption for the face."""
         return self.__absorption
 
+    def get_orientation(self) -> int:
+        """Get the number of pending clockwise quarter turns of the face."""
+        return self.__orientation
+
     def rotate_clockwise(self) -> None:
         """Rotate the face clockwise."""
-        self.__grid[:] = [[self.__grid[self.__size - j - 1][i] for j in range(self.__size)] for i in range(self.__size)]
+        self.__orientation = (self.__orientation + 1) % 4
 
     def rotate_counter_clockwise(self) -> None:
         """Rotate the face counter-clockwise."""
-        self.__grid[:] = [[self.__grid[j][self.__size - i - 1] for j in range(self.__size)] for i in range(self.__size)]
+        self.__orientation = (self.__orientation + 3) % 4
 
     def rotate_180(self) -> None:
         """Rotate the face 180 degrees."""
-        self.rotate_clockwise()
-        self.rotate_clockwise()
+        self.__orientation = (self.__orientation + 2) % 4
+
+    def __reorient(self) -> None:
+        """Physically rotate the grid to match its orientation."""
+        for _ in range(self.__orientation):
+            self.__grid[:] = [
+                [self.__grid[self.__size - j - 1][i] for j in range(self.__size)] for i in range(self.__size)
+            ]
+
+        self.__orientation = 0
+
+    def __materialise(self) -> None:
+        """Apply all pending offsets to the cells of the grid."""
+        if not self.__has_pending:
+            return
+
+        face_offset: int = self.__face_offset
+        col_offsets: list[int] = self.__col_offsets
+
+        if self.__use_numpy:
+            offsets: Any = face_offset + np.add.outer(self.__row_offsets, col_offsets)
+            self.__array = (self.__array + offsets - 1) % 100 + 1
+
+        else:
+            self.__grid = [
+                [
+                    self.update_value(cell_value=cell_value, value=face_offset + row_offset + col_offset)
+                    for cell_value, col_offset in zip(row, col_offsets)
+                ]
+                for row, row_offset in zip(self.__grid, self.__row_offsets)
+            ]
+
+        self.__face_offset = 0
+        self.__row_offsets = [0] * self.__size
+        self.__col_offsets = [0] * self.__size
+        self.__has_pending = False
+
+    def __physical_line(self, index: int, is_row: bool) -> tuple[int, bool]:
+        """Map a logical ROW/COL onto the physical grid. Returns the physical index and whether it is a row."""
+        # Odd orientations swap rows and columns, and orientations 2 and 3 (rows) / 1 and 2 (cols) mirror the index.
+        is_physical_row: bool = is_row == (self.__orientation % 2 == 0)
+        mirrored: bool = self.__orientation in ((2, 3) if is_row else (1, 2))
+        return (self.__size - index - 1 if mirrored else index), is_physical_row
 
     @staticmethod
     def update_value(cell_value: int, value: int) -> int:
@@ -46,18 +141,24 @@ class Face:
 
     def update_face(self, value: int) -> None:
         """Update all the grid positions on the face."""
-        self.__grid = [
-            [self.update_value(cell_value=cell_value, value=value) for cell_value in row] for row in self.__grid
-        ]
+        self.__face_offset = (self.__face_offset + value) % 100
+        self.__has_pending = True
 
     def update_row(self, row: int, value: int) -> None:
         """Update all grid positions in the row on the face."""
-        self.__grid[row] = [self.update_value(cell_value=cell_value, value=value) for cell_value in self.__grid[row]]
+        self.__update_line(index=row, value=value, is_row=True)
 
     def update_column(self, col: int, value: int) -> None:
         """Update all grid positions in the column on the face."""
-        for row in self.__grid:
-            row[col] = self.update_value(cell_value=row[col], value=value)
+        self.__update_line(index=col, value=value, is_row=False)
+
+    def __update_line(self, index: int, value: int, is_row: bool) -> None:
+        """Update all grid positions in the logical ROW/COL on the face."""
+        physical_index, is_physical_row = self.__physical_line(index=index, is_row=is_row)
+
+        offsets: list[int] = self.__row_offsets if is_physical_row else self.__col_offsets
+        offsets[physical_index] = (offsets[physical_index] + value) % 100
+        self.__has_pending = True
 
     def update_absorption(self, value: int) -> None:
         """Update the absorption of the face."""
@@ -67,11 +168,11 @@ class Face:
 class Cube:
     """Cube for the problem."""
 
-    def __init__(self, face_size: int) -> None:
+    def __init__(self, face_size: int, use_numpy: bool = False) -> None:
         self.__face_size: int = face_size
 
         # Format: FBLURD
-        self.__faces: list[Face] = [Face(id_=i + 1, size=self.__face_size) for i in range(6)]
+        self.__faces: list[Face] = [Face(id_=i + 1, size=self.__face_size, use_numpy=use_numpy) for i in range(6)]
         self.__current: Face = self.__faces[0]
         self.__down: Face = self.__faces[1]
         self.__back: Face = self.__faces[2]
@@ -176,11 +277,48 @@ class Cube:
         return math.prod([f.get_dominant_sum() for f in self.__faces])
 
 
-def part_01_02(size: int, instructions: list[str], twists: str) -> tuple[int, int]:
-    """Solve Part 01 and 02."""
+def get_absorption_only(size: int, instructions: list[str], twists: str) -> list[int]:
+    """Get the dice absorptions without building any of the face grids.
+
+    Only the face that is current for each instruction matters, so the twists are replayed as a permutation of the
+    face identities, in the same (current, down, back, up, left, right) layout as the `Cube`.
+    """
+    # New layout, in terms of the indices of the old layout
+    permutations: dict[str, tuple[int, ...]] = {
+        "L": (4, 1, 5, 3, 2, 0),
+        "U": (3, 0, 1, 2, 4, 5),
+        "R": (5, 1, 4, 3, 0, 2),
+        "D": (1, 2, 3, 0, 4, 5),
+    }
+
+    layout: tuple[int, ...] = (0, 1, 2, 3, 4, 5)
+    face_values: list[int] = [0] * 6  # ROW/COL, absorbs value * size
+    full_face_values: list[int] = [0] * 6  # FACE, absorbs value * size ** 2
+
+    for instruction, twist in zip(instructions, twists + " "):
+        value: int = int(instruction.rsplit(" ", 1)[-1])
+
+        if instruction.startswith("FACE"):
+            full_face_values[layout[0]] += value
+        else:
+            face_values[layout[0]] += value
+
+        if twist in permutations:
+            layout = tuple(layout[i] for i in permutations[twist])
+
+    return [v * size + fv * size**2 for v, fv in zip(face_values, full_face_values)]
+
+
+def part_01(size: int, instructions: list[str], twists: str) -> int:
+    """Solve Part 01."""
+    return math.prod(sorted(get_absorption_only(size=size, instructions=instructions, twists=twists))[-2:])
+
+
+def part_02(size: int, instructions: list[str], twists: str) -> int:
+    """Solve Part 02."""
     cube: Cube = Cube(face_size=size)
     cube.perform_actions(instructions=instructions, twists=twists)
-    return math.prod(sorted(cube.get_absorption())[-2:]), cube.get_overall_dominant_sum()
+    return cube.get_overall_dominant_sum()
 
 
 def part_03(size: int, instructions: list[str], twists: str) -> int:
@@ -200,10 +338,11 @@ def solve() -> None:
     instructions: list[str] = sections[0].strip().split("\n")
     size: int = 80
 
-    # Part 01, 02
-    p1: int
-    p2: int
-    p1, p2 = part_01_02(instructions=instructions, twists=twists, size=size)
+    # Part 01
+    p1: int = part_01(instructions=instructions, twists=twists, size=size)
+
+    # Part 02
+    p2: int = part_02(instructions=instructions, twists=twists, size=size)
 
     # Part 03
     p3: int = part_03(instructions=instructions, twists=twists, size=size)